@@ -1,9 +1,14 @@
 #!/usr/bin/env python
+import os
+# Configure the CUDA caching allocator before torch touches the GPU. Expandable
+# segments absorb the growing DenseNet concatenations and varying activation
+# sizes without fragmenting, instead of flushing with torch.cuda.empty_cache()
+os.environ.setdefault('PYTORCH_CUDA_ALLOC_CONF', 'expandable_segments:True,max_split_size_mb:128')
 import torch
 import torch.nn as nn
 import torch.optim as optim
 import torchvision
-import torchvision.transforms as transforms
+from torchvision.transforms import v2
 from torch.utils.data import DataLoader
 from torch.utils.tensorboard import SummaryWriter
 import torch.nn.functional as F
@@ -13,14 +18,13 @@ import numpy as np
 from pathlib import Path
 from quaternion.qbatch_norm import IQBN, IQBN
 import sys
-import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from quaternion.conv import QConv2D, QDense, QConv
 from quaternion.qactivation import QPReLU, QPReLU, QREReLU, QSiLU
 import tqdm
 import signal
 import sys
-import gc
+import argparse
 from typing import OrderedDict
 import math 
 import random 
@@ -62,6 +66,10 @@ def handle_keyboard_interrupt(signum, frame):
     except Exception as e:
         print(f"Error saving checkpoint: {e}")
     
+    # Hand cached GPU memory back on the way out. empty_cache is expensive (it
+    # syncs and walks every allocator block), so this is the one place for it
+    torch.cuda.empty_cache()
+    
     # Exit cleanly
     sys.exit(0)
 
@@ -89,21 +97,35 @@ EPSILON = 1e-7
 L1_REG = 1e-5
 L2_REG = 1e-4
 DATA_AUGMENTATION = True
+GPU_AUGMENTATION = True  # Batched crop/flip/normalize on the GPU instead of PIL workers
+LOG_INTERVAL = 50  # Batches between progress-bar refreshes (each one syncs with the GPU)
+CIFAR10_MEAN = (0.4914, 0.4822, 0.4465)
+CIFAR10_STD = (0.2023, 0.1994, 0.2010)
+CUTOUT_FILL = tuple(round(m * 255) for m in CIFAR10_MEAN)  # Mean color: ~0 once normalized
 DEVICE = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+# Autocast dtype for forward passes: bfloat16 needs no loss scaling; GPUs
+# without bf16 support fall back to float16 with a GradScaler
+AMP_DTYPE = (torch.bfloat16 if not torch.cuda.is_available() or torch.cuda.is_bf16_supported()
+             else torch.float16)
 SAVE_DIR = 'saved_models_feb'
 MODEL_NAME = 'Q34_adamw.pth'
 
 class L1Regularization:
-    """L1 regularization for network parameters"""
+    """L1 regularization for network parameters (call outside autocast to keep the sum in FP32)"""
     def __init__(self, l1_lambda):
         self.l1_lambda = l1_lambda
+        self.model = None
+        self.params = []
         
     def __call__(self, model):
-        l1_reg = torch.tensor(0., requires_grad=True)
-        for name, param in model.named_parameters():
-            if 'bias' not in name:
-                l1_reg = l1_reg + torch.sum(torch.abs(param))
-        return self.l1_lambda * l1_reg
+        # Collect the regularized (non-bias) parameters once per model
+        if model is not self.model:
+            self.model = model
+            self.params = [param for name, param in model.named_parameters() if 'bias' not in name]
+        
+        # Per-tensor L1 norms in one multi-tensor kernel, then a single sum
+        l1_norms = torch._foreach_norm(self.params, 1)
+        return self.l1_lambda * torch.stack(l1_norms).sum()
 
 
 
@@ -168,28 +190,43 @@ class QuaternionDropout(nn.Module):
     """
     Applies the same dropout mask across all four components of a quaternion tensor.
     
+    The drop probability and the 1 / (1 - p) scale are kept in tensor buffers
+    updated whenever ``p`` is assigned, so changing the rate (e.g. in
+    QResNet34.update_dropout_rates) does not invalidate a compiled graph.
+    
     Args:
         p (float): Probability of an element to be zeroed. Default: 0.5.
     """
     def __init__(self, p=0.5):
         super(QuaternionDropout, self).__init__()
+        self.register_buffer('_drop_p', torch.tensor(0.0), persistent=False)
+        self.register_buffer('_inv_keep', torch.tensor(1.0), persistent=False)
         self.p = p
 
+    @property
+    def p(self):
+        return self._p
+
+    @p.setter
+    def p(self, value):
+        self._p = value
+        self._active = value > 0.0
+        self._drop_p.fill_(value)
+        self._inv_keep.fill_(1.0 / (1.0 - value) if value < 1.0 else 0.0)
+
     def forward(self, x: torch.Tensor) -> torch.Tensor:
-        if not self.training or self.p == 0.0:
+        if not self.training or not self._active:
             return x  # No dropout during evaluation or if p=0
         
-        B, C, Q, H, W = x.shape
-        assert Q == 4, "Expected quaternion format with 4 components."
-        
-        # Generate dropout mask for one quaternion component (shape: B, C, H, W)
-        mask = torch.rand(B, C, H, W, device=x.device, dtype=x.dtype) > self.p
+        # One dropout mask per quaternion (shape: B, C, 1, H, W) with the
+        # 1 / (1 - p) scale folded in, so broadcasting over the quaternion dim
+        # applies it to all four components in a single multiply. The mask is
+        # drawn fresh each call (autograd keeps it for backward) and in float32,
+        # so the random numbers are not quantized under a bf16 autocast
+        mask_shape = (x.size(0), x.size(1), 1, x.size(-2), x.size(-1))
+        mask = torch.rand(mask_shape, device=x.device).gt_(self._drop_p).mul_(self._inv_keep)
         
-        # Expand mask to all quaternion components (shape: B, C, 4, H, W)
-        mask = mask.unsqueeze(2).expand(B, C, Q, H, W)
-        
-        # Apply mask and scale the output
-        return x * mask / (1 - self.p)
+        return x * mask.to(x.dtype)
 
 class QuaternionAvgPool(nn.Module):
     """Quaternion-aware average pooling"""
@@ -199,27 +236,22 @@ class QuaternionAvgPool(nn.Module):
         self.stride = stride
         
     def forward(self, x: torch.Tensor) -> torch.Tensor:
-        B, C, Q, H, W = x.shape
-        assert Q == 4, "Expected quaternion format with 4 components"
-        
-        # Reshape to (B * Q, C, H, W) for spatial pooling
-        x_reshaped = x.permute(0, 2, 1, 3, 4).reshape(B * Q, C, H, W)
+        # Pooling is per-channel, so fold Q into the channel dim: (B, C * 4, H, W)
+        # is a free view of the contiguous (B, C, 4, H, W) layout
+        x_flat = x.flatten(1, 2)
         
         # Apply pooling
         if self.kernel_size is None:
             # Global average pooling
-            pooled = F.adaptive_avg_pool2d(x_reshaped, (1, 1))
+            pooled = F.adaptive_avg_pool2d(x_flat, (1, 1))
         else:
             # Strided pooling
-            pooled = F.avg_pool2d(x_reshaped, 
+            pooled = F.avg_pool2d(x_flat, 
                                 kernel_size=self.kernel_size,
                                 stride=self.stride)
         
-        # Get output dimensions
-        H_out, W_out = pooled.shape[-2:]
-        
-        # Reshape back to quaternion format (B, C, 4, H_out, W_out)
-        return pooled.view(B, Q, C, H_out, W_out).permute(0, 2, 1, 3, 4)
+        # Split channels back into quaternion format (B, C, 4, H_out, W_out)
+        return pooled.unflatten(1, (-1, 4))
 
 class QuaternionMaxPool(nn.Module):
     """Quaternion-aware max pooling"""
@@ -228,18 +260,15 @@ class QuaternionMaxPool(nn.Module):
         self.pool = nn.MaxPool2d(kernel_size=kernel_size, stride=stride, padding=padding)
         
     def forward(self, x: torch.Tensor) -> torch.Tensor:
-        B, C, Q, H, W = x.shape
-        assert Q == 4, "Expected quaternion format with 4 components"
-        
-        # Reshape to (B * Q, C, H, W) for spatial pooling
-        x_reshaped = x.permute(0, 2, 1, 3, 4).reshape(B * Q, C, H, W)
+        # Pooling is per-channel, so fold Q into the channel dim: (B, C * 4, H, W)
+        # is a free view of the contiguous (B, C, 4, H, W) layout
+        x_flat = x.flatten(1, 2)
         
         # Apply pooling
-        pooled = self.pool(x_reshaped)
+        pooled = self.pool(x_flat)
         
-        # Reshape back to (B, C, 4, H_out, W_out)
-        H_out, W_out = pooled.shape[-2:]
-        return pooled.view(B, Q, C, H_out, W_out).permute(0, 2, 1, 3, 4)
+        # Split channels back into quaternion format (B, C, 4, H_out, W_out)
+        return pooled.unflatten(1, (-1, 4))
 
 
 class BasicBlock(nn.Module):
@@ -288,6 +317,19 @@ class BasicBlock(nn.Module):
         
         return out
 
+class ResidualStage(nn.ModuleList):
+    """
+    A stage of residual blocks applied in order.
+    
+    Holds the blocks like nn.Sequential (same state_dict keys, indexable and
+    iterable) but runs them through one explicit loop, which torch.compile
+    unrolls into a single graph spanning the whole stage.
+    """
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        for block in self:
+            x = block(x)
+        return x
+
 class ResNet34(nn.Module):
     """
     Standard ResNet34 implementation following the original paper structure
@@ -338,7 +380,7 @@ class ResNet34(nn.Module):
         for _ in range(1, blocks):
             layers.append(BasicBlock(out_channels, out_channels, stride=1))
         
-        return nn.Sequential(*layers)
+        return ResidualStage(layers)
     
     def _initialize_weights(self):
         """Initialize model weights (Kaiming initialization)"""
@@ -367,30 +409,28 @@ class ResNet34(nn.Module):
         x = self.fc(x)
         
         return x
-def count_parameters(model):
-    """Count trainable parameters in the model"""
-    return sum(p.numel() for p in model.parameters() if p.requires_grad)
 
 class BottleneckBlock(nn.Module):
     def __init__(self, in_planes, out_planes, dropRate=0.0):
         super(BottleneckBlock, self).__init__()
         inter_planes = out_planes * 4
         self.bn1 = IQBN(in_planes)
-        self.relu = QPReLU
+        self.relu = QPReLU()
         self.conv1 = QConv2D(in_planes, inter_planes, kernel_size=1, stride=1,
                            padding=0, bias=False)
         self.bn2 = IQBN(inter_planes)
         self.conv2 = QConv2D(inter_planes, out_planes, kernel_size=3, stride=1,
                            padding=1, bias=False)
         self.droprate = dropRate
+        self.dropout1 = QuaternionDropout(p=dropRate) if dropRate > 0 else nn.Identity()
+        self.dropout2 = QuaternionDropout(p=dropRate) if dropRate > 0 else nn.Identity()
     def forward(self, x):
-        out = self.conv1(self.relu(self.bn1(x)))
-        if self.droprate > 0:
-            out = QuaternionDropout(p=self.droprate)(out)
-        out = self.conv2(self.relu(self.bn2(out)))
-        if self.droprate > 0:
-            out = QuaternionDropout(p=self.droprate)(out)
-        return torch.cat([x, out], 1)
+        # IQBN / QPReLU / QuaternionDropout each run as one fused elementwise
+        # pass; the convs in between stay on cuDNN
+        out = self.dropout1(self.conv1(self.relu(self.bn1(x))))
+        out = self.dropout2(self.conv2(self.relu(self.bn2(out))))
+        # Only the new features; DenseBlock handles the concatenation
+        return out
 
 class TransitionBlock(nn.Module):
     def __init__(self, in_planes, out_planes, dropRate=0.0):
@@ -400,11 +440,10 @@ class TransitionBlock(nn.Module):
         self.conv1 = QConv2D(in_planes, out_planes, kernel_size=1, stride=1,
                            padding=0, bias=False)
         self.droprate = dropRate
+        self.dropout = QuaternionDropout(p=dropRate) if dropRate > 0 else nn.Identity()
         self.pool = QuaternionAvgPool(kernel_size=2, stride=2)
     def forward(self, x):
-        out = self.conv1(self.relu(self.bn1(x)))
-        if self.droprate > 0:
-            out = QuaternionDropout(p=self.droprate)(out)
+        out = self.dropout(self.conv1(self.relu(self.bn1(x))))
         return self.pool(out)
 
 class DenseBlock(nn.Module):
@@ -412,12 +451,31 @@ class DenseBlock(nn.Module):
         super(DenseBlock, self).__init__()
         self.layer = self._make_layer(block, in_planes, growth_rate, nb_layers, dropRate)
     def _make_layer(self, block, in_planes, growth_rate, nb_layers, dropRate):
+        # Quaternion channel counts (dim 1 of the (B, C, 4, H, W) activations)
+        self.growth = growth_rate // 4
+        self.out_channels = (in_planes + nb_layers * growth_rate) // 4
         layers = []
         for i in range(nb_layers):
             layers.append(block(in_planes+i*growth_rate, growth_rate, dropRate))
         return nn.Sequential(*layers)
     def forward(self, x):
-        return self.layer(x)
+        if torch.is_grad_enabled():
+            # Autograd keeps each layer's input for backward, so in-place writes
+            # into a shared buffer would invalidate them; concatenate instead
+            for layer in self.layer:
+                x = torch.cat([x, layer(x)], 1)
+            return x
+
+        # No autograd: allocate the final dense output once and have each
+        # layer read its prefix and write its features into the next slice
+        B, C, Q, H, W = x.shape
+        out = x.new_empty(B, self.out_channels, Q, H, W)
+        out[:, :C] = x
+        end = C
+        for layer in self.layer:
+            out[:, end:end + self.growth] = layer(out[:, :end])
+            end += self.growth
+        return out
 
 class QuaternionDenseNet(nn.Module):
     def __init__(self, depth, num_classes, growth_rate=12,
@@ -457,7 +515,7 @@ class QuaternionDenseNet(nn.Module):
         # Global average pooling and classifier
         self.bn1 = IQBN(in_planes)
         self.relu = QPReLU()
-        self.fc = QDense(in_planes, num_classes * 4)  # *4 for quaternion output
+        self.fc = QDense(in_planes, num_classes * 4, real_output=True)  # One logit per class
         self.in_planes = in_planes
         self.global_pool = QuaternionAvgPool()
 
@@ -471,12 +529,7 @@ class QuaternionDenseNet(nn.Module):
         # Use quaternion global pooling
         out = self.global_pool(out)
         out = out.view(-1, self.in_planes)
-        out = self.fc(out)
-        
-        # Extract real components for final output
-        batch_size = out.size(0)
-        out = out.view(batch_size, -1, 4)  # Reshape to separate quaternion components
-        return out[:, :, 0]  # Return real component [batch_size, num_classes]
+        return self.fc(out)  # [batch_size, num_classes]
 
 def create_quaternion_densenet(depth=40, num_classes=10, growth_rate=12, dropRate=0.0):
     """Helper function to create a Quaternion DenseNet with standard configuration"""
@@ -567,10 +620,18 @@ class QResNet34(nn.Module):
             QDense(256, 512, mapping_type=mapping_type),
             nn.SiLU(),
             nn.Dropout(p=0.3),  # Classifier dropout
-            QDense(512, num_classes * 4, mapping_type=mapping_type)
+            QDense(512, num_classes * 4, mapping_type=mapping_type, real_output=True)
         )
         # Final FC layer: 10 output classes
         # self.fc = nn.Linear(1024, num_classes)
+        
+        # Collect the dropout modules once, indexed like current_rates, so rate
+        # updates are plain attribute writes instead of a traversal per call
+        self._dropouts_by_idx = [
+            [m for m in stage.modules() if isinstance(m, QuaternionDropout)]
+            for stage in (self.conv2_x, self.conv3_x, self.conv4_x, self.conv5_x)
+        ]
+        self._classifier_dropout = self.classifier[3]
 
     def update_dropout_rates(self):
         """Increase dropout rates by the increment amount"""
@@ -578,21 +639,12 @@ class QResNet34(nn.Module):
             self.current_rates[i] = min(0.5, self.current_rates[i] + self.dropout_rates['increment'])
             
         # Update dropout in all blocks
-        self._update_block_dropout(self.conv2_x, 0)
-        self._update_block_dropout(self.conv3_x, 1)
-        self._update_block_dropout(self.conv4_x, 2)
-        self._update_block_dropout(self.conv5_x, 3)
+        for rate_idx, dropouts in enumerate(self._dropouts_by_idx):
+            for dropout in dropouts:
+                dropout.p = self.current_rates[rate_idx]
         
         # Update classifier dropout
-        if isinstance(self.classifier[3], nn.Dropout):
-            self.classifier[3].p = self.current_rates[4]
-
-    def _update_block_dropout(self, block, rate_idx):
-        """Update dropout rates in a block"""
-        for layer in block:
-            if isinstance(layer, QuaternionBasicBlock):
-                layer.dropout1.p = self.current_rates[rate_idx]
-                layer.dropout2.p = self.current_rates[rate_idx]
+        self._classifier_dropout.p = self.current_rates[4]
 
 
     def _make_layer(self, in_channels, out_channels, num_blocks, stride, mapping_type, dropout_idx):
@@ -616,7 +668,7 @@ class QResNet34(nn.Module):
                 dropout_rate=self.current_rates[dropout_idx]  # Same dropout rate for all blocks in layer
             ))
         
-        return nn.Sequential(*layers)
+        return ResidualStage(layers)
         
 
     def forward(self, x):
@@ -632,21 +684,15 @@ class QResNet34(nn.Module):
         x = self.gap(x)  # [3 × 128]
 
         
-        # Dropout
-        x = self.classifier(x)
-
-        batch_size = x.size(0)
-        x = x.view(batch_size, NUM_CLASSES, 4)  # Reshape to separate quaternion components
-        real_components = x[:, :, 0]  # Take only real part [batch_size, NUM_CLASSES]
-        
-        return real_components
+        # Classifier emits one logit per class directly [batch_size, num_classes]
+        return self.classifier(x)
 
 
 class QuaternionCIFAR10(nn.Module):
     """
     Quaternion CNN model for CIFAR-10 classification.
     """
-    def __init__(self, mapping_type='luminance'):
+    def __init__(self, mapping_type='luminance', dropout_rates=(0.1, 0.1, 0.1, 0.1)):
         super(QuaternionCIFAR10, self).__init__()
     
         # PREVIOUSLY WORKING CODE
@@ -700,7 +746,8 @@ class QuaternionCIFAR10(nn.Module):
 
         # Pooling and dropout
         self.pool = nn.MaxPool2d(kernel_size=2, stride=2, padding=1)
-        self.dropout = QuaternionDropout(p=0.1)
+        # One dropout per pooled stage, so each stage carries its own rate
+        self.dropouts = nn.ModuleList(QuaternionDropout(p=rate) for rate in dropout_rates)
 
         # Classifier
         self.classifier = nn.Sequential(
@@ -708,7 +755,7 @@ class QuaternionCIFAR10(nn.Module):
             QDense(256, 512, mapping_type=mapping_type),
             nn.ReLU(),
             nn.Dropout(0.3),
-            QDense(512, NUM_CLASSES * 4, mapping_type=mapping_type)  # Output 4x classes for quaternion
+            QDense(512, NUM_CLASSES * 4, mapping_type=mapping_type, real_output=True)  # One logit per class
         )
     
     def pool_spatial_only(self, x: torch.Tensor) -> torch.Tensor:
@@ -722,32 +769,26 @@ class QuaternionCIFAR10(nn.Module):
         Returns:
             torch.Tensor: Pooled tensor of shape (B, C, 4, H_out, W_out).
         """
-        B, C, Q, H, W = x.shape
-        assert Q == 4, "Expected quaternion format with 4 components."
-
-        # Reshape to (B * Q, C, H, W) for spatial pooling
-        x_reshaped = x.permute(0, 2, 1, 3, 4).reshape(B * Q, C, H, W)
+        # Pooling is per-channel, so fold Q into the channel dim: (B, C * 4, H, W)
+        # is a free view of the contiguous (B, C, 4, H, W) layout
+        x_flat = x.flatten(1, 2)
 
         # Apply pooling
-        pooled = self.pool(x_reshaped)
+        pooled = self.pool(x_flat)
 
-        # Reshape back to (B, C, 4, H_out, W_out)
-        H_out, W_out = pooled.shape[-2:]
-        return pooled.view(B, Q, C, H_out, W_out).permute(0, 2, 1, 3, 4)
+        # Split channels back into quaternion format (B, C, 4, H_out, W_out)
+        return pooled.unflatten(1, (-1, 4))
 
     def avg_pool(self, x: torch.Tensor, num) -> torch.Tensor:
-        B, C, Q, H, W = x.shape
-        assert Q == 4, "Expected quaternion format with 4 components."
-
-        # Reshape to (B * Q, C, H, W) for spatial pooling
-        x_reshaped = x.permute(0, 2, 1, 3, 4).reshape(B * Q, C, H, W)
+        # Pooling is per-channel, so fold Q into the channel dim: (B, C * 4, H, W)
+        # is a free view of the contiguous (B, C, 4, H, W) layout
+        x_flat = x.flatten(1, 2)
 
         # Apply pooling
-        pooled = F.adaptive_avg_pool2d(x_reshaped, (num, num))
+        pooled = F.adaptive_avg_pool2d(x_flat, (num, num))
 
-        # Reshape back to (B, C, 4, H_out, W_out)
-        H_out, W_out = pooled.shape[-2:]
-        return pooled.view(B, Q, C, H_out, W_out).permute(0, 2, 1, 3, 4)
+        # Split channels back into quaternion format (B, C, 4, H_out, W_out)
+        return pooled.unflatten(1, (-1, 4))
 
     def forward(self, x):
         # Initial block
@@ -756,157 +797,184 @@ class QuaternionCIFAR10(nn.Module):
         # First block with dropout
         x = self.block1(x)
         x = self.pool_spatial_only(x)  # Custom quaternion spatial pooling
-        x = self.dropout(x)
+        x = self.dropouts[0](x)
         
         # Second block
         x = self.block2(x)
         x = self.pool_spatial_only(x)  # Custom quaternion spatial pooling
-        x = self.dropout(x)
+        x = self.dropouts[1](x)
         
         # Third block
         x = self.block3(x)
         x = self.pool_spatial_only(x)  # Custom quaternion spatial pooling
-        x = self.dropout(x)
+        x = self.dropouts[2](x)
         
         # Fourth block
         x = self.block4(x)
         x = self.pool_spatial_only(x)  # Alternate between avg and spatial pooling
-        x = self.dropout(x)
-        
-        # Classifier
-        x = self.classifier(x)
-        
-        # Extract only real components for final classification
-        batch_size = x.size(0)
-        x = x.view(batch_size, NUM_CLASSES, 4)  # Reshape to separate quaternion components
-        real_components = x[:, :, 0]  # Take only real part [batch_size, NUM_CLASSES]
+        x = self.dropouts[3](x)
         
-        return real_components
+        # Classifier emits one logit per class directly [batch_size, NUM_CLASSES]
+        return self.classifier(x)
 
-def seed_worker(worker_id):
-    worker_seed = torch.initial_seed() % 2**32  # Get seed from the initial seed
-    np.random.seed(worker_seed)
-    random.seed(worker_seed)
-    torch.manual_seed(worker_seed)
+def set_random_seeds(seed=42, deterministic=False):
+    """
+    Set random seeds for reproducibility
 
-def set_random_seeds(seed=42):
-    """Set random seeds for reproducibility"""
+    Args:
+        seed (int): Seed for the Python, NumPy and torch RNGs.
+        deterministic (bool): Force deterministic cuDNN kernels. When False,
+            cuDNN autotuning is enabled instead, which picks the fastest conv
+            algorithm for the fixed CIFAR input/batch shapes.
+    """
     torch.manual_seed(seed)
     torch.cuda.manual_seed(seed)
     torch.cuda.manual_seed_all(seed)  # For multi-GPU
     np.random.seed(seed)
     random.seed(seed)
-    torch.backends.cudnn.deterministic = True
-    torch.backends.cudnn.benchmark = False
+    torch.backends.cudnn.deterministic = deterministic
+    torch.backends.cudnn.benchmark = not deterministic
     os.environ['PYTHONHASHSEED'] = str(seed)
 
 class MultiAugmentDataset(torch.utils.data.Dataset):
-    """Dataset wrapper that applies multiple augmentations to each image"""
-    def __init__(self, dataset, augmentations_per_image=3, train=True, seed=42):
+    """Dataset wrapper that applies multiple augmentations to each image.
+    
+    The wrapped dataset's pixels are converted once, up front, to a uint8
+    (N, C, H, W) tensor that workers share; the torchvision v2 transforms then
+    run on tensors directly instead of round-tripping through PIL. Samples stay
+    uint8: the training loop converts and normalizes whole batches on the GPU
+    (see GPUAugment.normalize), which also keeps the pinned host-to-device
+    copies at a quarter of the float32 size.
+    
+    Because samples are views of that shared tensor, transforms must never
+    modify their input in place (see Cutout, which copies before filling).
+    
+    The wrapped dataset must expose torchvision-CIFAR-style ``data``, a uint8
+    (N, H, W, 3) array, and ``targets``, a length-N sequence of class ids.
+    """
+    def __init__(self, dataset, augmentations_per_image=3, train=True):
+        assert hasattr(dataset, 'data') and hasattr(dataset, 'targets'), \
+            "MultiAugmentDataset needs a dataset with .data (N, H, W, 3) and .targets"
+        assert dataset.data.ndim == 4 and dataset.data.shape[-1] == 3, \
+            f"expected .data of shape (N, H, W, 3), got {tuple(dataset.data.shape)}"
         self.dataset = dataset
+        self.images = torch.from_numpy(np.asarray(dataset.data, dtype=np.uint8)).permute(0, 3, 1, 2).contiguous()
+        self.labels = [int(t) for t in dataset.targets]
+        self.n = len(dataset)
         self.augmentations_per_image = augmentations_per_image
         self.train = train
-        self.rng = np.random.RandomState(seed)  # Local RNG for transforms
-        
-        # Import AutoAugment for CIFAR10
-        from torchvision.transforms import AutoAugment, AutoAugmentPolicy
         
         # Create deterministic transforms
-        self.strong_transform = transforms.Compose([
-            transforms.RandomCrop(32, padding=4),
-            transforms.RandomHorizontalFlip(),
-            AutoAugment(AutoAugmentPolicy.CIFAR10),
-            transforms.ToTensor(),
-            transforms.Normalize((0.4914, 0.4822, 0.4465), 
-                               (0.2023, 0.1994, 0.2010)),
-            Cutout(n_holes=1, length=16)
+        self.strong_transform = v2.Compose([
+            v2.RandomCrop(32, padding=4),
+            v2.RandomHorizontalFlip(),
+            v2.AutoAugment(v2.AutoAugmentPolicy.CIFAR10),
+            Cutout(n_holes=1, length=16, fill=CUTOUT_FILL)
         ])
         
-        self.weak_transform = transforms.Compose([
-            transforms.RandomCrop(32, padding=4),
-            transforms.RandomHorizontalFlip(),
-            transforms.ToTensor(),
-            transforms.Normalize((0.4914, 0.4822, 0.4465), 
-                               (0.2023, 0.1994, 0.2010))
+        self.weak_transform = v2.Compose([
+            v2.RandomCrop(32, padding=4),
+            v2.RandomHorizontalFlip()
         ])
         
-        self.test_transform = transforms.Compose([
-            transforms.ToTensor(),
-            transforms.Normalize((0.4914, 0.4822, 0.4465), 
-                               (0.2023, 0.1994, 0.2010))
-        ])
+        # Indexed by "is this a strong copy", so the per-sample choice is a lookup
+        self._transforms = (self.weak_transform, self.strong_transform)
+
+    def _resolve(self, index):
+        """Map a loader index to (dataset row, augmentation or None)."""
+        if not self.train:
+            return index, None
+        # Index space is augmentations_per_image copies of the dataset; the
+        # DataLoader's seeded shuffle mixes them, no index table needed.
+        # Augmentations draw from the worker's torch/random streams, which
+        # the DataLoader seeds once per worker from its generator
         
-        # Pre-compute indices with fixed random state
-        if self.train:
-            self.indices = []
-            for idx in range(len(dataset)):
-                self.indices.extend([idx] * augmentations_per_image)
-            
-            # Shuffle indices deterministically
-            self.rng.shuffle(self.indices)
+        # First copy of each image is always weak, others are strong
+        return index % self.n, self._transforms[index >= self.n]
 
     def __getitem__(self, index):
-        if self.train:
-            real_idx = self.indices[index]
-            image, label = self.dataset[real_idx]
-            
-            # Set the random state based on index for reproducible augmentations
-            torch.manual_seed(index)
-            
-            # First augmentation is always weak, others are strong
-            if index % self.augmentations_per_image == 0:
-                transformed = self.weak_transform(image)
-            else:
-                transformed = self.strong_transform(image)
-                
-            return transformed, label
-        else:
-            image, label = self.dataset[index]
-            return self.test_transform(image), label
+        real_idx, transform = self._resolve(index)
+        image = self.images[real_idx]
+        if transform is not None:
+            image = transform(image)
+        return image, self.labels[real_idx]
+
+    def __getitems__(self, indices):
+        # Batched fetch, called by the DataLoader once per batch: the rows for
+        # the whole batch are gathered in a single indexing op, then each
+        # sample gets its own augmentation (normalization runs on the GPU)
+        resolved = [self._resolve(i) for i in indices]
+        real_idx = [r for r, _ in resolved]
+        images = self.images[real_idx]
+        return [(image if transform is None else transform(image), self.labels[r])
+                for (r, transform), image in zip(resolved, images)]
 
     def __len__(self):
         if self.train:
-            return len(self.dataset) * self.augmentations_per_image
-        return len(self.dataset)
+            return self.n * self.augmentations_per_image
+        return self.n
 
 class Cutout:
-    """Randomly mask out a square patch from an image."""
-    def __init__(self, n_holes=1, length=16):
+    """Randomly mask out a square patch from an image.
+    
+    Holes are set to ``fill`` (a per-channel value), 0 by default. For uint8
+    images that are normalized later, fill with the dataset mean color so the
+    hole is zero after normalization.
+    
+    The input is never modified: holes are filled on a copy, since the image
+    may be a view of a shared dataset tensor (see MultiAugmentDataset).
+    """
+    def __init__(self, n_holes=1, length=16, fill=0):
         self.n_holes = n_holes
         self.length = length
+        self.fill = torch.tensor(fill).view(-1, 1, 1)
 
     def __call__(self, img):
         h = img.size(1)
         w = img.size(2)
         
-        # Use deterministic random state based on image content
-        state = torch.get_rng_state()
+        # Copy first so earlier transforms in the pipeline never have to
+        img = img.clone()
         
-        mask = torch.ones((h, w), device=img.device)
+        # Hole bounds are plain Python ints from the (per-worker seeded) random
+        # module, and each hole is filled in place on the copy: no mask tensor
         for n in range(self.n_holes):
-            y = torch.randint(0, h, (1,))
-            x = torch.randint(0, w, (1,))
-
-            y1 = torch.clamp(y - self.length // 2, 0, h)
-            y2 = torch.clamp(y + self.length // 2, 0, h)
-            x1 = torch.clamp(x - self.length // 2, 0, w)
-            x2 = torch.clamp(x + self.length // 2, 0, w)
+            y = random.randrange(h)
+            x = random.randrange(w)
 
-            mask[y1:y2, x1:x2] = 0.
+            y1 = max(0, y - self.length // 2)
+            y2 = min(h, y + self.length // 2)
+            x1 = max(0, x - self.length // 2)
+            x2 = min(w, x + self.length // 2)
 
-        mask = mask.expand_as(img)
-        img = img * mask
-        
-        # Restore random state
-        torch.set_rng_state(state)
+            img[:, y1:y2, x1:x2] = self.fill
         
         return img
 
-def get_data_loaders(batch_size=256, augmentations_per_image=1, num_workers=1, seed=42):
-    """Get train and test data loaders with reproducible augmentations"""
+# Same helpers as utils.torch_utils; kept local because importing the utils
+# package runs utils/__init__ (OpenCV, matplotlib, logging setup), which this
+# script does not otherwise need
+def available_cpus():
+    """Number of CPUs this process may run on (respects affinity/cgroup limits on Linux)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def default_num_workers(max_workers=8):
+    """DataLoader worker count: one per available CPU, capped at max_workers."""
+    return min(available_cpus(), max_workers)
+
+def get_data_loaders(batch_size=256, augmentations_per_image=1, num_workers=None, seed=42,
+                     deterministic=False):
+    """Get train and test data loaders with reproducible augmentations
+    (num_workers=None picks one worker per available CPU, up to 8)"""
+    if num_workers is None:
+        num_workers = default_num_workers()
+    elif num_workers > available_cpus():
+        print(f"Warning: num_workers={num_workers} exceeds the {available_cpus()} available CPUs")
     
     # Set global random seeds
-    set_random_seeds(seed)
+    set_random_seeds(seed, deterministic=deterministic)
     
     # Create generator with fixed seed
     g = torch.Generator()
@@ -922,148 +990,458 @@ def get_data_loaders(batch_size=256, augmentations_per_image=1, num_workers=1, s
     train_dataset = MultiAugmentDataset(
         trainset, 
         augmentations_per_image=augmentations_per_image,
-        train=True,
-        seed=seed
+        train=True
     )
     test_dataset = MultiAugmentDataset(
         testset,
         augmentations_per_image=1,
-        train=False,
-        seed=seed
+        train=False
     )
     
-    # Create data loaders with fixed seeds
-    train_loader = DataLoader(
-        train_dataset,
+    # Worker settings shared by both loaders. Loading in the main process
+    # (num_workers=0) rejects persistent_workers/prefetch_factor, and pinning
+    # only pays off when there is a GPU to copy to
+    use_workers = num_workers > 0
+    loader_kwargs = dict(
         batch_size=batch_size,
-        shuffle=True,
         num_workers=num_workers,
-        worker_init_fn=seed_worker,  # Use the module-level function
+        # Also seeds torch and random in each worker (base seed + worker id)
         generator=g,
-        pin_memory=True,
-        persistent_workers=True,
-        prefetch_factor=3,
+        pin_memory=torch.cuda.is_available(),
+        persistent_workers=use_workers,
+        prefetch_factor=3 if use_workers else None,
         drop_last=True
     )
+    print(f"DataLoader: num_workers={num_workers}, pin_memory={loader_kwargs['pin_memory']}, "
+          f"persistent_workers={use_workers}, prefetch_factor={loader_kwargs['prefetch_factor']}")
     
-    test_loader = DataLoader(
-        test_dataset,
+    # Create data loaders with fixed seeds
+    train_loader = DataLoader(train_dataset, shuffle=True, **loader_kwargs)
+    test_loader = DataLoader(test_dataset, shuffle=False, **loader_kwargs)
+    
+    return train_loader, test_loader
+
+class GPUAugment:
+    """
+    Batched CIFAR augmentation on the GPU.
+
+    Equivalent of the weak transform (RandomCrop(32, padding=4) +
+    RandomHorizontalFlip + ToTensor + Normalize) applied to a whole uint8
+    batch at once. Crop and flip are folded into a single gather on the
+    uint8 data, followed by one float conversion + normalize pass. With
+    cutout_length > 0 a per-sample Cutout square is also zeroed, as one
+    broadcast mask over the batch.
+    """
+    def __init__(self, mean=CIFAR10_MEAN, std=CIFAR10_STD, padding=4, cutout_length=0,
+                 device=DEVICE):
+        self.padding = padding
+        self.cutout_length = cutout_length
+        # Pre-scaled by 255 so normalization works directly on uint8 values,
+        # and folded into x * scale + bias so it is a single multiply-add
+        mean = torch.tensor(mean, device=device).view(1, 3, 1, 1) * 255
+        std = torch.tensor(std, device=device).view(1, 3, 1, 1) * 255
+        self.scale = 1.0 / std
+        self.bias = -mean / std
+
+    def __call__(self, images: torch.Tensor, train: bool = True) -> torch.Tensor:
+        """
+        Args:
+            images (torch.Tensor): uint8 batch of shape (B, 3, H, W) on the target device.
+            train (bool): Apply the random crop/flip; only normalize otherwise.
+
+        Returns:
+            torch.Tensor: Normalized float32 batch of shape (B, 3, H, W).
+        """
+        if train:
+            images = self.random_crop_flip(images)
+        images = self.normalize(images)
+        if train and self.cutout_length > 0:
+            images = self.random_cutout(images)
+        return images
+
+    def normalize(self, images: torch.Tensor) -> torch.Tensor:
+        """uint8 (B, 3, H, W) batch -> normalized float32, in one batched op."""
+        return torch.addcmul(self.bias, images.float(), self.scale)
+
+    def random_crop_flip(self, images: torch.Tensor) -> torch.Tensor:
+        B, C, H, W = images.shape
+        p = self.padding
+        device = images.device
+        padded = F.pad(images, (p, p, p, p))
+
+        # Per-sample crop offsets into the padded image
+        top = torch.randint(0, 2 * p + 1, (B, 1), device=device)
+        left = torch.randint(0, 2 * p + 1, (B, 1), device=device)
+        rows = top + torch.arange(H, device=device)
+        cols = left + torch.arange(W, device=device)
+
+        # Horizontal flip is just reversed column indices
+        flip = torch.rand(B, 1, device=device) < 0.5
+        cols = torch.where(flip, cols.flip(1), cols)
+
+        batch_idx = torch.arange(B, device=device).view(B, 1, 1, 1)
+        channel_idx = torch.arange(C, device=device).view(1, C, 1, 1)
+        return padded[batch_idx, channel_idx, rows.view(B, 1, H, 1), cols.view(B, 1, 1, W)]
+
+    def random_cutout(self, images: torch.Tensor) -> torch.Tensor:
+        # Same holes as Cutout(n_holes=1): centre anywhere in the image, square
+        # clipped at the borders, zeroed after normalization
+        B, C, H, W = images.shape
+        half = self.cutout_length // 2
+        device = images.device
+        cy = torch.randint(0, H, (B, 1, 1), device=device)
+        cx = torch.randint(0, W, (B, 1, 1), device=device)
+        rows = torch.arange(H, device=device).view(1, H, 1)
+        cols = torch.arange(W, device=device).view(1, 1, W)
+        hole = (rows >= cy - half) & (rows < cy + half) & (cols >= cx - half) & (cols < cx + half)
+        return images.masked_fill_(hole.unsqueeze(1), 0.)
+
+class GPUAugmentLoader:
+    """
+    Iterates over a dataset held as a single uint8 (N, 3, H, W) tensor,
+    shipping each raw batch to the GPU and augmenting it there.
+
+    Stands in for a DataLoader over MultiAugmentDataset when only the weak
+    augmentation is needed (AutoAugment for strong augmentations still runs
+    on the CPU path). With preload=True the whole uint8 dataset is copied to
+    the device once (CIFAR-10 is ~150MB) and batches are gathered there, so
+    there are no per-batch host-to-device copies at all.
+    """
+    def __init__(self, images, labels, batch_size, augment, train=True,
+                 drop_last=True, seed=42, preload=False, device=DEVICE):
+        if preload:
+            images = images.to(device)
+            labels = labels.to(device)
+        self.images = images
+        self.labels = labels
+        self.batch_size = batch_size
+        self.augment = augment
+        self.train = train
+        self.drop_last = drop_last
+        self.device = device
+        self.generator = torch.Generator()
+        self.generator.manual_seed(seed)
+
+        # Pinned staging buffers, allocated once and reused for every batch so
+        # H2D copies can be asynchronous. Double-buffered: a slot is only
+        # refilled after the copy that last read from it has completed.
+        self.pinned = torch.device(device).type == 'cuda' and images.device.type == 'cpu'
+        if self.pinned:
+            self.staging = [
+                (torch.empty((batch_size, *images.shape[1:]), dtype=images.dtype, pin_memory=True),
+                 torch.empty((batch_size,), dtype=labels.dtype, pin_memory=True))
+                for _ in range(2)
+            ]
+            self.copy_done = [None, None]
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.images) // self.batch_size
+        return math.ceil(len(self.images) / self.batch_size)
+
+    def __iter__(self):
+        n = len(self.images)
+        order = torch.randperm(n, generator=self.generator) if self.train else torch.arange(n)
+        order = order.to(self.images.device)
+
+        for step, start in enumerate(range(0, len(self) * self.batch_size, self.batch_size)):
+            idx = order[start:start + self.batch_size]
+            if not self.pinned:
+                yield self.augment(self.images[idx], train=self.train), self.labels[idx]
+                continue
+
+            # Gather the batch straight into a pinned staging slot
+            slot = step % 2
+            if self.copy_done[slot] is not None:
+                self.copy_done[slot].synchronize()
+            image_buf, label_buf = self.staging[slot]
+            batch_len = len(idx)
+            torch.index_select(self.images, 0, idx, out=image_buf[:batch_len])
+            torch.index_select(self.labels, 0, idx, out=label_buf[:batch_len])
+
+            images = image_buf[:batch_len].to(self.device, non_blocking=True)
+            labels = label_buf[:batch_len].to(self.device, non_blocking=True)
+            self.copy_done[slot] = torch.cuda.Event()
+            self.copy_done[slot].record()
+
+            yield self.augment(images, train=self.train), labels
+
+class CUDAPrefetcher:
+    """
+    Wraps a DataLoader so the next batch's host-to-device copy runs on a side
+    CUDA stream while the current batch is being computed on the default one.
+
+    Yields (inputs, targets) already on the device. The loader should use
+    pin_memory=True so the copies are truly asynchronous. Off CUDA it just
+    iterates the loader.
+    """
+    def __init__(self, loader, device=DEVICE):
+        self.loader = loader
+        self.device = torch.device(device)
+        self.stream = torch.cuda.Stream(self.device) if self.device.type == 'cuda' else None
+
+    def __len__(self):
+        return len(self.loader)
+
+    def _preload(self, batches):
+        try:
+            inputs, targets = next(batches)
+        except StopIteration:
+            return None
+        with torch.cuda.stream(self.stream):
+            return (inputs.to(self.device, non_blocking=True),
+                    targets.to(self.device, non_blocking=True))
+
+    def __iter__(self):
+        if self.stream is None:
+            yield from self.loader
+            return
+
+        batches = iter(self.loader)
+        batch = self._preload(batches)
+        while batch is not None:
+            # Compute must not start before this batch's copy has landed
+            current = torch.cuda.current_stream(self.device)
+            current.wait_stream(self.stream)
+            inputs, targets = batch
+            # Tensors allocated on the side stream are now used on the compute
+            # stream; tell the allocator so their memory isn't reused too early
+            inputs.record_stream(current)
+            targets.record_stream(current)
+            # Start copying the next batch before handing this one out
+            batch = self._preload(batches)
+            yield inputs, targets
+
+def get_gpu_data_loaders(batch_size=256, seed=42, preload=True, cutout_length=0, device=DEVICE):
+    """Get train and test loaders that keep raw uint8 CIFAR-10 and augment on the GPU"""
+    trainset = torchvision.datasets.CIFAR10(
+        root='./data', train=True, download=True, transform=None)
+    testset = torchvision.datasets.CIFAR10(
+        root='./data', train=False, download=True, transform=None)
+
+    augment = GPUAugment(CIFAR10_MEAN, CIFAR10_STD, padding=4, cutout_length=cutout_length,
+                         device=device)
+
+    def to_tensors(dataset):
+        # (N, H, W, 3) uint8 numpy -> (N, 3, H, W) uint8 tensor
+        images = torch.from_numpy(dataset.data).permute(0, 3, 1, 2).contiguous()
+        labels = torch.tensor(dataset.targets, dtype=torch.long)
+        return images, labels
+
+    train_loader = GPUAugmentLoader(
+        *to_tensors(trainset),
         batch_size=batch_size,
-        shuffle=False,
-        num_workers=num_workers,
-        worker_init_fn=seed_worker,  # Use the module-level function
-        generator=g,
-        pin_memory=True,
-        persistent_workers=True,
-        prefetch_factor=3,
-        drop_last=True
+        augment=augment,
+        train=True,
+        seed=seed,
+        preload=preload,
+        device=device
     )
-    
+
+    test_loader = GPUAugmentLoader(
+        *to_tensors(testset),
+        batch_size=batch_size,
+        augment=augment,
+        train=False,
+        seed=seed,
+        preload=preload,
+        device=device
+    )
+
     return train_loader, test_loader
 
-def train_epoch(model, train_loader, criterion, optimizer, epoch, device):
+def train_epoch(model, train_loader, criterion, optimizer, epoch, device,
+                memory_format=torch.contiguous_format, scaler=None, normalize=None):
     """
     Train for one epoch with optimized GPU handling
+    (inputs are laid out in memory_format, e.g. torch.channels_last for ResNet34;
+    scaler is a GradScaler, only enabled when autocasting to float16;
+    normalize, if given, turns the raw uint8 batch into model inputs on the GPU)
     """
+    if scaler is None:
+        scaler = torch.amp.GradScaler(device.type, enabled=False)
     model.train()
-    running_loss = 0.0
-    correct = 0
+    # Metrics accumulate on the device; only the progress bar (every
+    # LOG_INTERVAL batches) and the epoch result synchronize with the host
+    running_loss = torch.zeros((), device=device)
+    correct = torch.zeros((), device=device, dtype=torch.long)
     total = 0
     
     train_pbar = tqdm.tqdm(train_loader, desc='Training', position=1, leave=False)
+    last_batch = len(train_loader) - 1
     
     for batch_idx, (inputs, targets) in enumerate(train_pbar):
         # Move data to GPU efficiently
         inputs = inputs.cuda(device, non_blocking=True)
+        if normalize is not None:
+            inputs = normalize(inputs)
+        inputs = inputs.contiguous(memory_format=memory_format)
         targets = targets.cuda(device, non_blocking=True)
         
         # Zero gradients
         optimizer.zero_grad(set_to_none=True)  # More efficient than standard zero_grad()
         
-        # Forward pass
-        outputs = model(inputs)
-        loss = criterion(outputs, targets)
+        # Forward pass under autocast (parameters and the optimizer update
+        # stay FP32; IQBN running stats are accumulated in FP32)
+        with torch.autocast(device_type=device.type, dtype=AMP_DTYPE, enabled=device.type == 'cuda'):
+            outputs = model(inputs)
+            loss = criterion(outputs, targets)
         
-        # Backward pass
-        loss.backward()
-        torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
-        optimizer.step()
+        # Backward pass (scaling is a no-op unless autocasting to float16);
+        # gradients are unscaled before clipping so max_norm stays meaningful
+        scaler.scale(loss).backward()
+        scaler.unscale_(optimizer)
+        torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0, foreach=True)
+        scaler.step(optimizer)
+        scaler.update()
         
         # Update metrics
-        running_loss += loss.item()
+        running_loss += loss.detach()
         _, predicted = outputs.max(1)
         total += targets.size(0)
-        correct += predicted.eq(targets).sum().item()
+        correct += predicted.eq(targets).sum()
         
         # Update progress bar
-        train_pbar.set_postfix({
-            'Loss': f'{running_loss/(batch_idx+1):.4f}',
-            'Acc': f'{100.*correct/total:.2f}%'
-        })
-        
-        # Clean up GPU memory
-        del outputs, loss
+        if batch_idx % LOG_INTERVAL == 0 or batch_idx == last_batch:
+            train_pbar.set_postfix({
+                'Loss': f'{running_loss.item()/(batch_idx+1):.4f}',
+                'Acc': f'{100.*correct.item()/total:.2f}%'
+            })
         
     train_pbar.close()
-    return running_loss / len(train_loader), 100. * correct / total
+    return running_loss.item() / len(train_loader), 100. * correct.item() / total
 
-def evaluate(model, test_loader, criterion, device):
+def warm_up_compiled(model, criterion, device, memory_format=torch.contiguous_format,
+                     batch_size=BATCH_SIZE):
+    """
+    Run one synthetic training step (forward + backward) and one eval forward
+    so torch.compile builds its graphs now, surfacing compile errors before
+    training starts. Parameters are untouched; gradients are cleared and
+    buffers (e.g. IQBN running stats) restored afterwards, also when
+    compilation fails partway through, so the synthetic batch never leaks
+    into the model.
+    """
+    saved_buffers = [b.detach().clone() for b in model.buffers()]
+    inputs = torch.randn(batch_size, 3, 32, 32, device=device).contiguous(memory_format=memory_format)
+    targets = torch.randint(0, NUM_CLASSES, (batch_size,), device=device)
+    
+    try:
+        model.train()
+        with torch.autocast(device_type=device.type, dtype=AMP_DTYPE, enabled=device.type == 'cuda'):
+            loss = criterion(model(inputs), targets)
+        loss.backward()
+        
+        model.eval()
+        with torch.no_grad(), torch.autocast(device_type=device.type, dtype=AMP_DTYPE,
+                                             enabled=device.type == 'cuda'):
+            model(inputs)
+    finally:
+        model.zero_grad(set_to_none=True)
+        with torch.no_grad():
+            for buf, saved in zip(model.buffers(), saved_buffers):
+                buf.copy_(saved)
+
+def evaluate(model, test_loader, criterion, device, memory_format=torch.contiguous_format,
+             normalize=None):
     """
     Evaluate with optimized GPU handling
     """
     model.eval()
-    test_loss = 0
-    correct = 0
+    test_loss = torch.zeros((), device=device)
+    correct = torch.zeros((), device=device, dtype=torch.long)
     total = 0
     
     with torch.no_grad():
         for inputs, targets in test_loader:
             inputs = inputs.cuda(device, non_blocking=True)
+            if normalize is not None:
+                inputs = normalize(inputs)
+            inputs = inputs.contiguous(memory_format=memory_format)
             targets = targets.cuda(device, non_blocking=True)
             
-            outputs = model(inputs)
-            loss = criterion(outputs, targets)
+            with torch.autocast(device_type=device.type, dtype=AMP_DTYPE, enabled=device.type == 'cuda'):
+                outputs = model(inputs)
+                loss = criterion(outputs, targets)
             
-            test_loss += loss.item()
+            test_loss += loss.detach()
             _, predicted = outputs.max(1)
             total += targets.size(0)
-            correct += predicted.eq(targets).sum().item()
-            
-            del outputs, loss
+            correct += predicted.eq(targets).sum()
     
-    return test_loss / len(test_loader), 100. * correct / total
+    return test_loss.item() / len(test_loader), 100. * correct.item() / total
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train quaternion CIFAR-10 classifiers")
+    parser.add_argument('--no-compile', dest='compile', action='store_false',
+                        help='Run the model eagerly instead of through torch.compile (debugging)')
+    parser.add_argument('--compile-mode', type=str, default='reduce-overhead',
+                        help='torch.compile mode (default, reduce-overhead, max-autotune)')
+    return parser.parse_args()
+
 
 def main():
+    args = parse_args()
     if not os.path.exists(SAVE_DIR):
         os.makedirs(SAVE_DIR)
     
     # Constants for augmentation
     NUM_AUGMENTATIONS = 1  # Number of augmentations per image
     RANDOM_SEED = 42
-    set_random_seeds(RANDOM_SEED)
+    DETERMINISTIC = False  # True trades cuDNN autotuning for bitwise reproducibility
+    # Seed (and configure cuDNN) before any model/optimizer construction
+    set_random_seeds(RANDOM_SEED, deterministic=DETERMINISTIC)
     # Initialize logging
     writer = SummaryWriter('runs/quaternion_densenet')
     metrics_logger = MetricsLogger(SAVE_DIR)
     
     # Get dataloaders with augmentation
-    train_loader, test_loader = get_data_loaders(
-        batch_size=BATCH_SIZE,
-        augmentations_per_image=1,
-        num_workers=4,
-        seed=RANDOM_SEED
-    )
+    if GPU_AUGMENTATION and NUM_AUGMENTATIONS == 1:
+        # Weak augmentation only: keep raw uint8 images and augment on the GPU
+        train_loader, test_loader = get_gpu_data_loaders(
+            batch_size=BATCH_SIZE,
+            seed=RANDOM_SEED,
+            device=DEVICE
+        )
+        normalize = None  # Batches arrive normalized
+    else:
+        train_loader, test_loader = get_data_loaders(
+            batch_size=BATCH_SIZE,
+            augmentations_per_image=NUM_AUGMENTATIONS,
+            num_workers=None,  # Sized from the available CPUs
+            seed=RANDOM_SEED,
+            deterministic=DETERMINISTIC
+        )
+        # Overlap each batch's H2D copy with the previous batch's compute
+        train_loader = CUDAPrefetcher(train_loader, device=DEVICE)
+        test_loader = CUDAPrefetcher(test_loader, device=DEVICE)
+        # Workers emit uint8; convert + normalize each batch on the GPU
+        normalize = GPUAugment(CIFAR10_MEAN, CIFAR10_STD, device=DEVICE).normalize
     # model = ResNet34(num_classes=10)
     model = QResNet34(num_classes=10, mapping_type='poincare')
     # Print model parameter count
     num_params = count_parameters(model)
     print(f'\nTotal trainable parameters: {num_params:,}')
 
+    # Move the model before building the optimizer so its state (and the
+    # fused kernel) is created directly on the device
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model = model.to(device)
+    memory_format = torch.contiguous_format
+    if isinstance(model, ResNet34):
+        # Real-valued convs run fastest in NHWC; the quaternion models keep
+        # their 5-D (B, C, 4, H, W) activations
+        memory_format = torch.channels_last
+        model = model.to(memory_format=memory_format)
+
     criterion = nn.CrossEntropyLoss()
+    # Fused CUDA SGD: momentum, weight decay and the Nesterov update for all
+    # parameters in a single multi-tensor kernel
     optimizer = torch.optim.SGD(model.parameters(), 
                             lr=0.1,
                             momentum=0.9, 
                             weight_decay=1e-4,
-                            nesterov=True)
+                            nesterov=True,
+                            fused=device.type == 'cuda')
     
 
     l1_reg = L1Regularization(L1_REG)
@@ -1082,17 +1460,37 @@ def main():
     best_acc = 0
     pbar = tqdm.tqdm(total=EPOCHS, desc='Training Progress', position=0)
   
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    model = model.to(device)
+    # Loss scaling is only needed for float16 autocast
+    scaler = torch.amp.GradScaler(device.type,
+                                  enabled=device.type == 'cuda' and AMP_DTYPE == torch.float16)
+    
+    # Keep a handle on the eager module so checkpoints keep their plain keys
+    raw_model = model
+    if args.compile:
+        # Inductor fuses the BN/activation/residual elementwise chains and
+        # reduce-overhead replays the static step as CUDA graphs; the 5-D
+        # quaternion ops may break the graph, so compile what it can trace.
+        # Compilation is lazy, so a warm-up step forces it here: if the
+        # requested mode fails, fall back to mode='default' (not to eager)
+        try:
+            model = torch.compile(raw_model, mode=args.compile_mode, fullgraph=False)
+            warm_up_compiled(model, criterion, device, memory_format)
+        except Exception as e:
+            print(f"torch.compile(mode='{args.compile_mode}') failed ({e}); using mode='default'")
+            torch._dynamo.reset()
+            model = torch.compile(raw_model, mode='default', fullgraph=False)
+            warm_up_compiled(model, criterion, device, memory_format)
     
 
     for epoch in range(EPOCHS):
         # Training
         train_loss, train_acc = train_epoch(
-            model, train_loader, criterion, optimizer, epoch, device)
+            model, train_loader, criterion, optimizer, epoch, device,
+            memory_format=memory_format, scaler=scaler, normalize=normalize)
         
         # Validation
-        test_loss, test_acc = evaluate(model, test_loader, criterion, device)
+        test_loss, test_acc = evaluate(model, test_loader, criterion, device,
+                                       memory_format=memory_format, normalize=normalize)
         
         # Step scheduler
         scheduler.step()
@@ -1132,15 +1530,11 @@ def main():
             print(f'\nSaving model (acc: {test_acc:.2f}%)')
             torch.save({
                 'epoch': epoch,
-                'model_state_dict': model.state_dict(),
+                'model_state_dict': raw_model.state_dict(),
                 'optimizer_state_dict': optimizer.state_dict(),
                 'scheduler_state_dict': scheduler.state_dict(),
                 'accuracy': best_acc,
             }, os.path.join(SAVE_DIR, MODEL_NAME))
-        
-        # Clean up
-        torch.cuda.empty_cache()
-        gc.collect()
     
     pbar.close()
     metrics_logger.plot('final_metrics.png')
@@ -1,5 +1,4 @@
 # engine/trainer.py
-import gc
 import os
 import csv
 import torch
@@ -14,7 +13,7 @@ import math
 class Trainer:
     def __init__(self, model, train_dataloader, val_dataloader, optimizer, scheduler, 
                  scaler, loss_fn, metrics, device, save_dir, grad_clip_val=0.5, 
-                 visualize=True, vis_batch_freq=100):
+                 visualize=True, vis_batch_freq=100, log_interval=50):
         """
         Initialize the Trainer.
 
@@ -29,9 +28,12 @@ class Trainer:
             metrics (MetricsClass): Instance of a metrics class to compute evaluation metrics.
             device (str): Device to train on ('cuda' or 'cpu').
             save_dir (str): Directory to save training logs and plots.
-            grad_clip_val (float, optional): Maximum gradient norm for clipping. Defaults to 1.0.
+            grad_clip_val (float, optional): Maximum gradient norm for clipping; None or 0 disables
+                clipping (and the unscale it requires). Defaults to 0.5.
             visualize (bool, optional): Whether to visualize training progress. Defaults to True.
             vis_batch_freq (int, optional): Frequency (in batches) to visualize training progress. Defaults to 100.
+            log_interval (int, optional): Batches between progress-bar refreshes; each refresh
+                synchronizes with the GPU. Defaults to 50.
         """
         super().__init__()
         self.model = model
@@ -47,30 +49,36 @@ class Trainer:
         self.grad_clip_val = grad_clip_val
         self.visualize = visualize
         self.vis_batch_freq = vis_batch_freq
+        self.log_interval = log_interval
         
         # Enhanced logging
         self.log_dir = os.path.join(save_dir, 'logs')
         os.makedirs(self.log_dir, exist_ok=True)
         self.train_log = os.path.join(self.log_dir, 'train_log.txt')
+        self.csv_file = os.path.join(self.log_dir, 'train_log.csv')
+        # CSV handle is opened once on first use and kept (line-buffered)
+        self._csv_fh = None
+        self._csv_writer = None
         
         # Initialize validation metrics
         self.best_map = 0.0
         self.best_epoch = 0
+        
+        # Per-epoch accumulators, allocated once and zeroed at the start of each epoch
+        self._metric_buffers = {k: torch.zeros((), device=device) for k in ('total_loss', 'num_pos')}
 
     def train_one_epoch(self, epoch):
         """Train for one epoch with visualization and metrics."""
         self.model.train()
-        epoch_metrics = {
-            'total_loss': 0.0,
-            'num_pos': 0
-        }
-        
-        if epoch == 0:  # Or based on memory monitoring
-            torch.cuda.empty_cache()
+        epoch_metrics = self._metric_buffers
+        for t in epoch_metrics.values():
+            t.zero_()
         
         pbar = tqdm(enumerate(self.train_dataloader), total=len(self.train_dataloader), 
                 desc=f"Epoch {epoch+1}", leave=False)
         
+        last_batch = len(self.train_dataloader) - 1
+        
         # Zero gradients once before the loop if using set_to_none=True
         self.optimizer.zero_grad(set_to_none=True)
         
@@ -98,9 +106,11 @@ class Trainer:
                 # Backward pass
                 self.scaler.scale(total_loss).backward()
                 
-                # Gradient clipping
-                self.scaler.unscale_(self.optimizer)
-                torch.nn.utils.clip_grad_norm_(self.model.parameters(), max_norm=10.0)
+                # Gradient clipping (norms of all parameters in one multi-tensor kernel)
+                if self.grad_clip_val:
+                    self.scaler.unscale_(self.optimizer)
+                    torch.nn.utils.clip_grad_norm_(self.model.parameters(),
+                                                   max_norm=self.grad_clip_val, foreach=True)
                 
                 # Optimize
                 self.scaler.step(self.optimizer)
@@ -111,8 +121,8 @@ class Trainer:
                 
                 self.optimizer.zero_grad(set_to_none=True)
 
-                # Update metrics
-                epoch_metrics['total_loss'] += total_loss.item()
+                # Update metrics (kept on the device until the end of the epoch)
+                epoch_metrics['total_loss'] += total_loss.detach()
                 epoch_metrics['num_pos'] += num_pos
                 
                 # Visualize batch
@@ -130,20 +140,23 @@ class Trainer:
                 #         batch_idx=batch_idx,
                 #         epoch=epoch
                 #     )
-                # Update progress bar
-                pbar.set_postfix({
-                    'loss': f"{total_loss.item():.4f}",
-                    'pos': num_pos
-                })
+                # Update progress bar (synchronizes, so only every log_interval batches)
+                if batch_idx % self.log_interval == 0 or batch_idx == last_batch:
+                    pbar.set_postfix({
+                        'loss': f"{total_loss.item():.4f}",
+                        'pos': int(num_pos)
+                    })
                 
             except Exception as e:
                 print(f"\nError in batch {batch_idx}:")
                 print(str(e))
                 continue
 
-        # Average the loss over batches
+        # Average the loss over batches; single host sync for the epoch
         num_batches = len(self.train_dataloader)
-        epoch_metrics['total_loss'] /= num_batches
+        epoch_metrics['total_loss'].div_(num_batches)
+        total_loss, num_pos = torch.stack([epoch_metrics['total_loss'], epoch_metrics['num_pos']]).tolist()
+        epoch_metrics = {'total_loss': total_loss, 'num_pos': int(num_pos)}
         
         # Plot training curves using your existing metrics
         if hasattr(self, 'metrics') and hasattr(self.metrics, 'plot'):
@@ -190,7 +203,8 @@ class Trainer:
                 })
                 targets.append(target_dict)
                 
-                pbar.set_postfix({'loss': f"{loss_dict['loss'].item():.4f}"})
+                if batch_idx % self.log_interval == 0 or batch_idx == len(self.val_dataloader) - 1:
+                    pbar.set_postfix({'loss': f"{loss_dict['loss'].item():.4f}"})
         
         # Normalize metrics
         num_batches = len(self.val_dataloader)
@@ -246,25 +260,37 @@ class Trainer:
             batch_idx=batch_idx
         )
 
+    def _open_csv(self, mode):
+        """Open the CSV log once and keep the writer around."""
+        self.close()
+        self._csv_fh = open(self.csv_file, mode, newline='', buffering=1)
+        self._csv_writer = csv.writer(self._csv_fh)
+
     def _initialize_csv(self):
         """Initialize the CSV log file with headers."""
-        with open(self.csv_file, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['epoch', 'batch', 'total_loss', 'box_loss', 'dfl_loss', 
-                            'quat_loss'])
+        self._open_csv('w')
+        self._csv_writer.writerow(['epoch', 'batch', 'total_loss', 'box_loss', 'dfl_loss', 
+                                   'quat_loss'])
 
     def _log_to_csv(self, epoch, batch, total_loss, box_loss, dfl_loss, quat_loss):
         """Log the training metrics to CSV."""
-        with open(self.csv_file, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                epoch,
-                batch,
-                total_loss,
-                box_loss,
-                dfl_loss,
-                quat_loss
-            ])
+        if self._csv_writer is None:
+            self._open_csv('a')
+        self._csv_writer.writerow([
+            epoch,
+            batch,
+            total_loss,
+            box_loss,
+            dfl_loss,
+            quat_loss
+        ])
+
+    def close(self):
+        """Close the CSV log file if it is open."""
+        if self._csv_fh is not None:
+            self._csv_fh.close()
+            self._csv_fh = None
+            self._csv_writer = None
 
     def validate_and_save(self, epoch):
         """Run validation and save best model."""
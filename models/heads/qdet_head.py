@@ -32,18 +32,15 @@ class QuaternionPooling(nn.Module):
         Returns:
             torch.Tensor: Pooled tensor of shape (B, C, 4, H_out, W_out)
         """
-        B, C, Q, H, W = x.shape
-        assert Q == 4, "Expected quaternion format with 4 components"
-        
-        # Reshape to (B * Q, C, H, W) for spatial pooling
-        x_reshaped = x.permute(0, 2, 1, 3, 4).reshape(B * Q, C, H, W)
+        # Pooling is per-channel, so fold Q into the channel dim: (B, C * 4, H, W)
+        # is a free view of the contiguous (B, C, 4, H, W) layout
+        x_flat = x.flatten(1, 2)
         
         # Apply pooling
-        pooled = self.pool(x_reshaped)
+        pooled = self.pool(x_flat)
         
-        # Reshape back to (B, C, 4, H_out, W_out)
-        H_out, W_out = pooled.shape[-2:]
-        return pooled.view(B, Q, C, H_out, W_out).permute(0, 2, 1, 3, 4)
+        # Split channels back into quaternion format (B, C, 4, H_out, W_out)
+        return pooled.unflatten(1, (-1, 4))
 
 class QExtractReal(nn.Module):
     """
@@ -52,19 +52,15 @@ class QuaternionUpsample(nn.Module):
         self.mode = mode
     
     def forward(self, x):
-        B, C, Q, H, W = x.shape
-        
-        # Reshape to handle quaternion components separately
-        x = x.permute(0, 2, 1, 3, 4).reshape(B*Q, C, H, W)
+        # Interpolation is per-channel, so fold Q into the channel dim as a
+        # free view of the contiguous (B, C, 4, H, W) layout
+        x = x.flatten(1, 2)
         
         # Upsample
         x = F.interpolate(x, scale_factor=self.scale_factor, mode=self.mode)
         
-        # Reshape back to quaternion format
-        _, _, H_new, W_new = x.shape
-        x = x.reshape(B, Q, C, H_new, W_new).permute(0, 2, 1, 3, 4)
-        
-        return x
+        # Split channels back into quaternion format (B, C, 4, H_new, W_new)
+        return x.unflatten(1, (-1, 4))
 
 class QuaternionFPN(nn.Module):
     """Feature Pyramid Network for Quaternion Neural Networks."""
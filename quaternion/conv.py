@@ -105,6 +105,16 @@ class QConv(nn.Module):
         self.conv_k = Conv(actual_in_channels, out_channels_quat, kernel_size,
                           stride, padding, dilation, groups, bias, 
                           padding_mode)
+        
+        # Row q holds the coefficients combining the (r, i, j, k) conv outputs
+        # into output component q; used by the fused single-conv forward. They
+        # reproduce _component_forward exactly, which builds out_i/j/k on top
+        # of the in-place out_r, hence r - 2k, r - 2i and r - 2j
+        self.register_buffer('_hamilton_signs', torch.tensor([[1., -1., -1., -1.],
+                                                              [1.,  0.,  0., -2.],
+                                                              [1., -2.,  0.,  0.],
+                                                              [1.,  0., -2.,  0.]]),
+                             persistent=False)
                       
         self._initialize_weights()
 
@@ -211,7 +221,13 @@ class QConv(nn.Module):
         # Handle RGB input
         if x.size(1) == 3:  # RGB input
             x = self.rgb_to_quaternion(x)
-            
+        
+        if self.rank == 2 and self.conv_r.padding_mode == 'zeros':
+            return self._fused_forward(x)
+        return self._component_forward(x)
+
+    def _component_forward(self, x: torch.Tensor) -> torch.Tensor:
+        """Per-component forward: one conv per quaternion component, then the sign combination."""
         if self.is_first_layer:
             # Process first layer more efficiently
             B, Q, H, W = x.shape
@@ -255,6 +271,30 @@ class QConv(nn.Module):
         
         return out
 
+    def _fused_forward(self, x: torch.Tensor) -> torch.Tensor:
+        """Single-launch forward: the four component convs as one grouped conv."""
+        if self.is_first_layer:
+            # rgb_to_quaternion already gives component-major (B, 4, H, W)
+            x_cat = x
+        else:
+            # (B, C, 4, H, W) -> component-major (B, 4 * C, H, W)
+            x_cat = x.transpose(1, 2).flatten(1, 2)
+        
+        # Stack the component kernels so each group block of the input only
+        # sees its own component's weights, exactly like conv_r/i/j/k
+        convs = (self.conv_r, self.conv_i, self.conv_j, self.conv_k)
+        weight = torch.cat([conv.weight for conv in convs], dim=0)
+        bias = torch.cat([conv.bias for conv in convs]) if self.conv_r.bias is not None else None
+        y = F.conv2d(x_cat, weight, bias, self.conv_r.stride, self.conv_r.padding,
+                     self.conv_r.dilation, 4 * self.groups)
+        
+        # Combine the component outputs with the Hamilton signs in one matmul
+        B, _, H_out, W_out = y.shape
+        out = torch.matmul(self._hamilton_signs.to(y.dtype), y.view(B, 4, -1))
+        
+        # Back to (B, C_out, 4, H_out, W_out)
+        return out.view(B, 4, -1, H_out, W_out).transpose(1, 2).contiguous()
+
     def rgb_to_quaternion(self, rgb_input):
         B, C, H, W = rgb_input.shape
         luminance = (0.299 * rgb_input[:, 0] + 0.587 * rgb_input[:, 1] + 0.114 * rgb_input[:, 2]).unsqueeze(1).to(rgb_input.device)
@@ -378,12 +418,17 @@ class QDense(nn.Module):
                  out_features: int, 
                  bias: bool = True,
                  mapping_type: str = 'poincare',
+                 real_output: bool = False,
                  device=None,
                  dtype=None):
         super(QDense, self).__init__()
 
                 # Add mapping strategy
         self.mapping_type = mapping_type
+        # Classification heads: emit only out.view(B, -1, 4)[:, :, 0] of the
+        # full (B, out_features) output, i.e. out_features // 4 values, with a
+        # single GEMM over just those rows (same weights as the full layer)
+        self.real_output = real_output
         
         # Ensure input features are handled correctly
         if in_features == 3:  # If input is RGB
@@ -455,6 +500,8 @@ class QDense(nn.Module):
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         if x.size(1) == 3:
             x = self.rgb_to_quaternion(x)
+        if self.real_output:
+            return self._real_forward(x)
         # Separate input into quaternion components
         x_r = x[:, :x.size(1)//4]
         x_i = x[:, x.size(1)//4:x.size(1)//2]
@@ -494,4 +541,27 @@ class QDense(nn.Module):
         
         return out
     
-    
\ No newline at end of file
+    def _real_forward(self, x: torch.Tensor) -> torch.Tensor:
+        # The full output is stack([out_r, out_i, out_j, out_k], dim=1) flattened,
+        # so flat index f holds component f // O of unit f % O. Build the rows of
+        # the equivalent (4 * O, 4 * I) block matrix over the packed
+        # [x_r, x_i, x_j, x_k] input, keep every 4th one and apply them in one GEMM
+        w_r, w_i = self.linear_rr.weight, self.linear_ri.weight
+        w_j, w_k = self.linear_rj.weight, self.linear_rk.weight
+        weight = torch.cat([
+            torch.cat([w_r, -w_i, -w_j, -w_k], dim=1),  # out_r = r_r - i_i - j_j - k_k
+            torch.cat([w_i, w_r, w_k, -w_j], dim=1),    # out_i = r_i + i_r + j_k - k_j
+            torch.cat([w_j, -w_k, w_r, w_i], dim=1),    # out_j = r_j - i_k + j_r + k_i
+            torch.cat([w_k, w_j, -w_i, w_r], dim=1),    # out_k = r_k + i_j - j_i + k_r
+        ], dim=0)[::4]
+        bias = None
+        if self.linear_rr.bias is not None:
+            b_r, b_i = self.linear_rr.bias, self.linear_ri.bias
+            b_j, b_k = self.linear_rj.bias, self.linear_rk.bias
+            bias = torch.cat([b_r - b_i - b_j - b_k,
+                              b_i + b_r + b_k - b_j,
+                              b_j - b_k + b_r + b_i,
+                              b_k + b_j - b_i + b_r])[::4]
+        return F.linear(x, weight, bias)
+    
+    
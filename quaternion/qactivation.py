@@ -10,6 +10,19 @@ import math
 
 __all__ = ['QHardTanh', 'QLeakyReLU', 'QuaternionActivation', 'QReLU', 'QPReLU', 'QREReLU', 'QSigmoid', 'QTanh']
 
+@torch.jit.script
+def _qprelu(x: torch.Tensor, weight: torch.Tensor) -> torch.Tensor:
+    # weight is (4 * num_parameters,) ordered [r..., i..., j..., k...];
+    # broadcast it as (1, num_parameters, 4, 1, 1) against (B, C, 4, H, W)
+    w = weight.view(4, -1).t().reshape(1, -1, 4, 1, 1).to(x.dtype)
+    return torch.where(x >= 0, x, x * w)
+
+
+@torch.jit.script
+def _qsilu(x: torch.Tensor) -> torch.Tensor:
+    return x * torch.sigmoid(x)
+
+
 class QuaternionActivation(nn.Module):
     """
     Quaternion Activation Function.
@@ -102,17 +115,8 @@ class QPReLU(nn.Module):
         
     def forward(self, x):
         # x shape: (batch_size, channels, 4, height, width)
-        # Get parameters for each component
-        w_r, w_i, w_j, w_k = self.weight.chunk(4)
-        
-        # Apply component-wise PReLU
-        x_r = F.prelu(x[:,:,0,:,:], w_r)
-        x_i = F.prelu(x[:,:,1,:,:], w_i)
-        x_j = F.prelu(x[:,:,2,:,:], w_j) 
-        x_k = F.prelu(x[:,:,3,:,:], w_k)
-        
-        # Stack components back together
-        return torch.stack([x_r, x_i, x_j, x_k], dim=2)
+        # Component-wise PReLU as a single fused elementwise kernel
+        return _qprelu(x, self.weight)
 
 class QSiLU(nn.Module):
     """
@@ -121,20 +125,10 @@ class QSiLU(nn.Module):
     """
     def __init__(self):
         super(QSiLU, self).__init__()
-        self.sigmoid = nn.Sigmoid()
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
-        # Create output tensor
-        out = torch.zeros_like(x)
-        
-        # Copy real component unchanged
-        # out[:,:,0,:,:] = x[:,:,0,:,:]
-        
-        # Apply SiLU to imaginary components
-        imag_parts = x[:,:,0:,:,:]
-        out[:,:,0:,:,:] = imag_parts * self.sigmoid(imag_parts)
-        
-        return out
+        # SiLU on all four components, fused into one elementwise kernel
+        return _qsilu(x)
 
 
 class QREReLU(nn.Module):
@@ -280,6 +280,17 @@ class QBN(nn.Module):
         
         return x_out
 
+@torch.jit.script
+def _iqbn_affine(x: torch.Tensor, mean: torch.Tensor, var: torch.Tensor,
+                 gamma: torch.Tensor, beta: torch.Tensor, eps: float) -> torch.Tensor:
+    # Fold normalization and affine into one per-(C, Q) scale/shift so x is
+    # read and written once: (x - mean) / sqrt(var + eps) * gamma + beta
+    scale = gamma * torch.rsqrt(var + eps)
+    shift = beta - mean * scale
+    C = scale.size(0)
+    return x * scale.view(1, C, 4, 1, 1) + shift.view(1, C, 4, 1, 1)
+
+
 class IQBN(nn.Module):
     def __init__(self, num_features, eps=1e-5, momentum=0.1):
         super().__init__()
@@ -301,10 +312,7 @@ class IQBN(nn.Module):
         
         if not self.training:
             # Faster evaluation using pre-computed stats
-            mean = self.running_mean.view(1, self.num_features, 4, 1, 1)
-            var = self.running_var.view(1, self.num_features, 4, 1, 1)
-            x_norm = (x - mean) / torch.sqrt(var + self.eps)
-            return x_norm * self.gamma.view(1, self.num_features, 4, 1, 1) + self.beta.view(1, self.num_features, 4, 1, 1)
+            return _iqbn_affine(x, self.running_mean, self.running_var, self.gamma, self.beta, self.eps)
         
         # Training mode optimized
         # Batch statistics - process all spatial dimensions at once for efficiency
@@ -317,11 +325,8 @@ class IQBN(nn.Module):
             self.running_mean = (1 - self.momentum) * self.running_mean + self.momentum * mean.squeeze()
             self.running_var = (1 - self.momentum) * self.running_var + self.momentum * var.squeeze()
         
-        # Normalize
-        x_norm = (x - mean.view(1, C, Q, 1, 1)) / torch.sqrt(var.view(1, C, Q, 1, 1) + self.eps)
-        
-        # Apply affine parameters
-        return x_norm * self.gamma.view(1, self.num_features, 4, 1, 1) + self.beta.view(1, self.num_features, 4, 1, 1)
+        # Normalize and apply affine parameters
+        return _iqbn_affine(x, mean.view(C, Q), var.view(C, Q), self.gamma, self.beta, self.eps)
 #     """
 #     Quaternion Batch Normalization with careful running stats management
 #     """
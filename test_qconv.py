@@ -0,0 +1,84 @@
+# test_qconv.py
+
+import torch
+from quaternion.conv import QConv2D, QDense
+
+
+def _check_fused_matches_components(in_channels, out_channels, **kwargs):
+    torch.manual_seed(0)
+    conv = QConv2D(in_channels, out_channels, **kwargs).eval()
+    if conv.is_first_layer:
+        x = conv.rgb_to_quaternion(torch.randn(2, 3, 16, 16))
+    else:
+        x = torch.randn(2, in_channels // 4, 4, 16, 16)
+
+    with torch.no_grad():
+        fused = conv._fused_forward(x)
+        reference = conv._component_forward(x)
+
+    assert fused.shape == reference.shape, f"{fused.shape} != {reference.shape}"
+    assert fused.is_contiguous()
+    max_err = (fused - reference).abs().max().item()
+    assert torch.allclose(fused, reference, atol=1e-5, rtol=1e-5), f"max abs error {max_err:.2e}"
+    print(f"QConv2D({in_channels}, {out_channels}, {kwargs}): max abs error {max_err:.2e}")
+
+
+def test_fused_matches_component_path():
+    """The single grouped-conv forward must reproduce the per-component forward."""
+    print("\n=== Testing fused QConv2D forward ===")
+    _check_fused_matches_components(3, 64, kernel_size=3, padding=1)
+    _check_fused_matches_components(64, 128, kernel_size=3, stride=2, padding=1)
+    _check_fused_matches_components(128, 128, kernel_size=1, bias=False)
+    _check_fused_matches_components(64, 64, kernel_size=3, padding=2, dilation=2)
+
+
+def test_component_signs():
+    """Each output component matches the combination the baseline QConv computes.
+
+    The per-component path builds out_i/j/k on top of the in-place out_r, so
+    the components are r - i - j - k, r - 2k, r - 2i and r - 2j. Trained
+    checkpoints depend on exactly this, so both paths must keep it.
+    """
+    print("\n=== Testing QConv2D component combination ===")
+    torch.manual_seed(0)
+    conv = QConv2D(32, 64, kernel_size=3, padding=1).eval()
+    x = torch.randn(2, 8, 4, 16, 16)
+
+    with torch.no_grad():
+        r = conv.conv_r(x[:, :, 0])
+        i = conv.conv_i(x[:, :, 1])
+        j = conv.conv_j(x[:, :, 2])
+        k = conv.conv_k(x[:, :, 3])
+        expected = torch.stack([r - i - j - k,
+                                r - 2 * k,
+                                r - 2 * i,
+                                r - 2 * j], dim=2)
+        for name, out in (('component', conv._component_forward(x)), ('fused', conv._fused_forward(x))):
+            max_err = (out - expected).abs().max().item()
+            assert torch.allclose(out, expected, atol=1e-5, rtol=1e-5), f"{name}: max abs error {max_err:.2e}"
+            print(f"{name} path: max abs error {max_err:.2e}")
+
+
+def test_qdense_real_output():
+    """real_output must return exactly the old head's out.view(B, -1, 4)[:, :, 0]."""
+    print("\n=== Testing QDense real_output ===")
+    torch.manual_seed(0)
+    full = QDense(512, 40).eval()
+    head = QDense(512, 40, real_output=True).eval()
+    head.load_state_dict(full.state_dict(), strict=True)
+    x = torch.randn(8, 512)
+
+    with torch.no_grad():
+        expected = full(x).view(x.size(0), -1, 4)[:, :, 0]
+        out = head(x)
+
+    assert out.shape == expected.shape, f"{out.shape} != {expected.shape}"
+    max_err = (out - expected).abs().max().item()
+    assert torch.allclose(out, expected, atol=1e-5, rtol=1e-5), f"max abs error {max_err:.2e}"
+    print(f"real_output head: max abs error {max_err:.2e}")
+
+
+if __name__ == "__main__":
+    test_fused_matches_component_path()
+    test_component_signs()
+    test_qdense_real_output()
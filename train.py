@@ -1,5 +1,4 @@
 # train.py
-import gc
 import os
 import torch
 import yaml
@@ -8,6 +7,7 @@ from data.dataloader import get_quaternion_dataloader
 from models.model_builder import load_model_from_yaml
 from loss.box_loss import DetectionLoss, ClassificationLoss # Changed from BboxLoss
 from engine.trainer import Trainer
+from utils.torch_utils import available_cpus, default_num_workers
 from utils.metrics import DetMetrics  # Changed from OBBMetrics
 from torch.optim import AdamW  # Changed from Adam
 from torch.optim.lr_scheduler import OneCycleLR  # Changed from CosineAnnealingLR
@@ -21,7 +21,8 @@ def parse_args():
     parser.add_argument('--lr', type=float, default=0.0001, help='Initial learning rate')  # Changed from 0.0001
     parser.add_argument('--save-dir', type=str, default='runs/train', help='Save directory')
     parser.add_argument('--resume', type=str, default='', help='Resume from checkpoint')
-    parser.add_argument('--workers', type=int, default=4, help='Number of workers')  # Added workers arg
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of dataloader workers (default: one per available CPU, up to 8)')
     parser.add_argument('--mapping-type', type=str, default='luminance', help='RGB to quaternion mapping type')
     return parser.parse_args()
 
@@ -94,6 +95,12 @@ def main():
     train_info = data_config['datasets'][active_dataset]['train']
     val_info = data_config['datasets'][active_dataset]['val']
     
+    # Size the dataloader workers from the CPUs actually available to us
+    if args.workers is None:
+        args.workers = default_num_workers()
+    elif args.workers > available_cpus():
+        print(f"Warning: --workers {args.workers} exceeds the {available_cpus()} available CPUs")
+    
     # Create dataloaders
     train_dataloader = get_quaternion_dataloader(
         img_dir=train_info['img_dir'],
@@ -203,7 +210,7 @@ def main():
         metrics=metrics,
         device=device,
         save_dir=args.save_dir,
-        grad_clip_val=0.5,
+        grad_clip_val=10.0,
         visualize=True,
         vis_batch_freq=100
     )
@@ -212,10 +219,6 @@ def main():
     for epoch in range(start_epoch, args.epochs):
         print(f"\n=== Epoch {epoch+1}/{args.epochs} ===")
         
-        # Clear cache
-        torch.cuda.empty_cache()
-        gc.collect()
-        
         # Train one epoch
         train_metrics = trainer.train_one_epoch(epoch)
         print(f"\nTraining Results:")
@@ -280,6 +283,7 @@ def main():
             current_lr = scheduler.get_last_lr()[0]
             print(f"\nLearning rate: {current_lr:.6f}")
             
+    trainer.close()
     print(f"\nTraining completed. Best mAP50: {best_map50:.4f}")
 
 if __name__ == "__main__":
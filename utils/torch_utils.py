@@ -1,7 +1,21 @@
 # utils/torch_utils
 
+import os
 from torch.cuda.amp import autocast, GradScaler
 
+
+def available_cpus():
+    """Number of CPUs this process may run on (respects affinity/cgroup limits on Linux)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def default_num_workers(max_workers=8):
+    """DataLoader worker count: one per available CPU, capped at max_workers."""
+    return min(available_cpus(), max_workers)
+
+
 def train_epoch(model, dataloader, optimizer, criterion, scaler, device):
     model.train()
     for batch in dataloader: